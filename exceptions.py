@@ -8,3 +8,9 @@ class ConnectionError(Exception):
     """Ошибка подключения."""
 
     pass
+
+
+class RequestTimeout(Exception):
+    """Превышено время ожидания ответа."""
+
+    pass
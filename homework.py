@@ -1,14 +1,22 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 import time
 from http import HTTPStatus
 
+import orjson
 import requests
 import telegram
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from telegram.utils.request import Request
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
 
-from exceptions import ConnectionError, InvalidResponseCode
+from exceptions import ConnectionError, InvalidResponseCode, RequestTimeout
 
 load_dotenv()
 
@@ -18,9 +26,35 @@ TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
 RETRY_PERIOD = 600
+REQUEST_TIMEOUT = (5, 25)
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
+_PARAMS = {'from_date': 0}
+_PARAMS_REQUEST = {
+    'url': ENDPOINT,
+    'params': _PARAMS,
+}
+
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_SESSION.mount(
+    'https://',
+    HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=4,
+        max_retries=Retry(
+            total=3,
+            connect=3,
+            read=3,
+            status=3,
+            backoff_factor=0.5,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False,
+        ),
+    ),
+)
 
 HOMEWORK_VERDICTS = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
@@ -28,50 +62,76 @@ HOMEWORK_VERDICTS = {
     'rejected': 'Работа проверена: у ревьюера есть замечания.',
 }
 
+_VERDICT_TEMPLATE = 'Изменился статус проверки работы "{}" {}'.format
+
+
+def get_session():
+    """Возвращает общую HTTP-сессию для запросов к API."""
+    return _SESSION
+
 
 def check_tokens():
     """Проверяет доступность переменных окружения."""
-    return all([TELEGRAM_TOKEN, PRACTICUM_TOKEN, TELEGRAM_CHAT_ID])
+    return bool(TELEGRAM_TOKEN and PRACTICUM_TOKEN and TELEGRAM_CHAT_ID)
 
 
 def send_message(bot, message):
-    """Отправляет сообщения в Telegram чат."""
+    """Отправляет сообщение в Telegram чат и сообщает, удалось ли это."""
     try:
-        logging.info(f'Отправка сообщения {message} начата')
+        logging.info('Отправка сообщения %s начата', message)
         bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
     except telegram.TelegramError as error:
-        logging.error(f'Сообщение не отправлено: {error}')
-    else:
-        logging.debug(f'Сообщение {message} успешно отправлено')
+        logging.error('Сообщение не отправлено: %s', error)
+        return False
+    logging.debug('Сообщение %s успешно отправлено', message)
+    return True
+
+
+def _is_timeout(error):
+    """Проверяет, вызвана ли ошибка запроса истечением таймаута."""
+    if isinstance(error, requests.Timeout):
+        return True
+    if not error.args:
+        return False
+    cause = error.args[0]
+    if isinstance(cause, ReadTimeoutError):
+        return True
+    return isinstance(getattr(cause, 'reason', None), ReadTimeoutError)
 
 
 def get_api_answer(timestamp):
     """Отправляет запрос к единственному эндпоинту API-сервиса."""
-    timestamp = int(time.time())
-    params = {'from_date': timestamp}
-    params_request = {
-        'url': ENDPOINT,
-        'headers': HEADERS,
-        'params': params,
-    }
+    _PARAMS['from_date'] = timestamp
     try:
-        logging.info(f'Начало запроса. URL: {ENDPOINT}; параметры: {params}')
-        response = requests.get(**params_request)
-        if response.status_code != HTTPStatus.OK:
-            raise InvalidResponseCode(
-                'Неверный код ответа. '
-                f'Статус: {response.status_code}'
-                f'Причина: {response.reason}'
-                f'Текст: {response.text}'
+        logging.info(
+            'Начало запроса. URL: %s; параметры: %s', ENDPOINT, _PARAMS
+        )
+        response = _SESSION.get(
+            **_PARAMS_REQUEST, stream=True, timeout=REQUEST_TIMEOUT
+        )
+        with response:
+            if response.status_code != HTTPStatus.OK:
+                body = response.content[:512].decode('utf-8', 'replace')
+                raise InvalidResponseCode(
+                    'Неверный код ответа. '
+                    f'Статус: {response.status_code}'
+                    f'Причина: {response.reason}'
+                    f'Текст: {body}'
+                )
+            return orjson.loads(response.content)
+    except InvalidResponseCode:
+        raise
+    except Exception as error:
+        if _is_timeout(error):
+            raise RequestTimeout(
+                'Превышено время ожидания ответа API: '
+                f'URL = {ENDPOINT}; {error}'
             )
-        return response.json()
-    except Exception:
         raise ConnectionError(
             (
-                'Ошибка подключения: URL = {url},'
-                'headers = {headers}; '
+                'Ошибка подключения: URL = {url}; '
                 'params = {params}'
-            ).format(**params_request)
+            ).format(**_PARAMS_REQUEST)
         )
 
 
@@ -84,6 +144,8 @@ def check_response(response):
         raise KeyError('Ключ homeworks отсутствует в ответе API')
     if 'current_date' not in response:
         raise KeyError('Ключ current_date отсутствует в ответе API')
+    if not isinstance(response['current_date'], int):
+        raise TypeError('current_date не является целым числом')
     homeworks = response['homeworks']
     if not isinstance(homeworks, list):
         raise TypeError('homeworks не является списком')
@@ -92,16 +154,16 @@ def check_response(response):
 
 def parse_status(homework):
     """Извлекает из общей информации статус о конкретной домашней работе."""
-    homework_name = homework.get('homework_name')
-    homework_status = homework.get('status')
-    if 'homework_name' not in homework:
-        raise KeyError('В ответе API отсутствует ключ homework_name')
-    if 'status' not in homework:
-        raise KeyError('В ответе API отсутствует ключ status')
-    if homework_status not in HOMEWORK_VERDICTS:
-        raise ValueError(f'Неизвестный статус работы: {homework_status}')
-    verdict = HOMEWORK_VERDICTS[homework_status]
-    return f'Изменился статус проверки работы "{homework_name}" {verdict}'
+    try:
+        homework_name = homework['homework_name']
+        homework_status = homework['status']
+    except KeyError as key:
+        raise KeyError(f'В ответе API отсутствует ключ {key}')
+    try:
+        verdict = HOMEWORK_VERDICTS[homework_status]
+    except KeyError:
+        raise ValueError(f'Неизвестный статус работы: {homework_status!r}')
+    return _VERDICT_TEMPLATE(homework_name, verdict)
 
 
 def main():
@@ -111,28 +173,63 @@ def main():
         sys.exit('Остановка программы в связи с отсутствием обязательной '
                  'переменной окружения'
                  )
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
+    request = Request(con_pool_size=8, connect_timeout=5.0, read_timeout=10.0)
+    bot = telegram.Bot(token=TELEGRAM_TOKEN, request=request)
+    _send = send_message
+    _get_api = get_api_answer
+    _check = check_response
+    _parse = parse_status
+    _log_err = logging.error
+    _now = time.monotonic
     timestamp = int(time.time())
+    next_tick = _now()
+    # Сообщения, уже доставленные для текущего from_date. API возвращает
+    # только работы, изменившиеся с from_date, поэтому повтор возможен лишь
+    # при повторном запросе того же окна, пока timestamp не сдвинут.
+    sent_in_window = set()
+    last_error_repr = None
     while True:
+        next_tick += RETRY_PERIOD
         try:
-            response = get_api_answer(timestamp)
-            homeworks = check_response(response)
-            if homeworks:
-                send_message(bot, parse_status(homeworks[0]))
-            timestamp = response.get('current_date', timestamp)
+            response = _get_api(timestamp)
+            homeworks = _check(response)
+            delivered = True
+            for homework in reversed(homeworks):
+                message = _parse(homework)
+                if message in sent_in_window:
+                    continue
+                if _send(bot, message):
+                    sent_in_window.add(message)
+                else:
+                    delivered = False
+            if delivered:
+                timestamp = response.get('current_date', timestamp)
+                sent_in_window.clear()
+            last_error_repr = None
         except Exception as error:
             message = f'Сбой в работе программы: {error}'
-            logging.error(message)
-            send_message(bot, message)
+            _log_err(message)
+            error_repr = f'{type(error).__name__}:{error}'
+            if error_repr != last_error_repr:
+                _send(bot, message)
+                last_error_repr = error_repr
         finally:
-            time.sleep(RETRY_PERIOD)
+            delay = max(0.0, next_tick - _now())
+            time.sleep(delay)
 
 
 if __name__ == '__main__':
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue,
+        logging.FileHandler('log.txt'),
+        logging.StreamHandler(sys.stdout),
+    )
+    listener.start()
+    atexit.register(listener.stop)
     logging.basicConfig(
         format='%(asctime)s - %(levelname)s - %(message)s',
         level=logging.DEBUG,
-        handlers=[logging.FileHandler('log.txt'),
-                  logging.StreamHandler(sys.stdout)]
+        handlers=[logging.handlers.QueueHandler(log_queue)]
     )
     main()
@@ -2,12 +2,16 @@ import inspect
 import logging
 import platform
 import re
+import socket
+import threading
 import time
 from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
 
 import pytest
 import requests
 import telegram
+import urllib3
 
 import utils
 
@@ -82,6 +86,18 @@ class TestHomework:
                 'current_date': 123246
             },
             None
+        ),
+        'current_date_not_int': utils.InvalidResponse(
+            {
+                'homeworks': [
+                    {
+                        'homework_name': 'hw123',
+                        'status': 'approved'
+                    }
+                ],
+                'current_date': '123246'
+            },
+            None
         )
     }
     NOT_OK_RESPONSES = {
@@ -172,14 +188,12 @@ class TestHomework:
             assert url.startswith(expected_url), (
                 'Проверьте адрес, на который отправляются запросы.'
             )
-            assert 'headers' in kwargs, (
-                'Проверьте, что в запрос к API передан заголовок.'
-            )
-            assert 'Authorization' in kwargs['headers'], (
+            headers = homework_module.get_session().headers
+            assert 'Authorization' in headers, (
                 'Проверьте, что в заголовках запроса передано поле '
                 '`Authorization`.'
             )
-            assert kwargs['headers']['Authorization'].startswith('OAuth '), (
+            assert headers['Authorization'].startswith('OAuth '), (
                 'Проверьте, что заголовок `Authorization` '
                 'начинается с `OAuth`.'
             )
@@ -200,7 +214,9 @@ class TestHomework:
                     'Проверьте, что в параметре `from_date` передано число.'
                 )
 
-        monkeypatch.setattr(requests, 'get', check_request_call)
+        monkeypatch.setattr(
+            homework_module.get_session(), 'get', check_request_call
+        )
         try:
             homework_module.get_api_answer(current_timestamp)
         except AssertionError:
@@ -223,7 +239,9 @@ class TestHomework:
                 current_timestamp=current_timestamp, **kwargs
             )
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(
+            homework_module.get_session(), 'get', mock_response_get
+        )
 
         result = homework_module.get_api_answer(current_timestamp)
         assert isinstance(result, dict), (
@@ -243,7 +261,9 @@ class TestHomework:
             self.HOMEWORK_FUNC_WITH_PARAMS_QTY[func_name]
         )
 
-        monkeypatch.setattr(requests, 'get', response)
+        monkeypatch.setattr(
+            homework_module.get_session(), 'get', response
+        )
         try:
             homework_module.get_api_answer(current_timestamp)
         except Exception:
@@ -254,6 +274,32 @@ class TestHomework:
                 'ситуация, когда API домашки возвращает код, отличный от 200.'
             )
 
+    def test_get_not_200_status_response_text(self, monkeypatch,
+                                              current_timestamp,
+                                              homework_module):
+        func_name = 'get_api_answer'
+        utils.check_function(
+            homework_module,
+            func_name,
+            self.HOMEWORK_FUNC_WITH_PARAMS_QTY[func_name]
+        )
+
+        monkeypatch.setattr(
+            homework_module.get_session(), 'get', self.NOT_OK_RESPONSES[401]
+        )
+        try:
+            homework_module.get_api_answer(current_timestamp)
+        except Exception as e:
+            assert 'not_authenticated' in str(e), (
+                f'Убедитесь, что функция `{func_name}` сообщает текст ответа '
+                'API домашки, когда код ответа отличается от 200.'
+            )
+        else:
+            raise AssertionError(
+                f'Убедитесь, что в функции `{func_name}` обрабатывается '
+                'ситуация, когда API домашки возвращает код, отличный от 200.'
+            )
+
     def test_get_api_answer_with_request_exception(self, current_timestamp,
                                                    monkeypatch,
                                                    homework_module):
@@ -267,7 +313,9 @@ class TestHomework:
         def mock_request_get_with_exception(*args, **kwargs):
             raise requests.RequestException('Something wrong')
 
-        monkeypatch.setattr(requests, 'get', mock_request_get_with_exception)
+        monkeypatch.setattr(
+            homework_module.get_session(), 'get', mock_request_get_with_exception
+        )
         try:
             homework_module.get_api_answer(current_timestamp)
         except requests.RequestException as e:
@@ -279,6 +327,177 @@ class TestHomework:
         except Exception:
             pass
 
+    def test_get_api_answer_with_timeout(self, current_timestamp,
+                                         monkeypatch, homework_module):
+        func_name = 'get_api_answer'
+        utils.check_function(
+            homework_module,
+            func_name,
+            self.HOMEWORK_FUNC_WITH_PARAMS_QTY[func_name]
+        )
+
+        attempts = []
+
+        def mock_make_request(pool, conn, method, url, timeout=None,
+                              **kwargs):
+            attempts.append(url)
+            raise urllib3.exceptions.ReadTimeoutError(
+                pool, url, 'Read timed out.'
+            )
+
+        retry = homework_module.get_session().get_adapter(
+            homework_module.ENDPOINT
+        ).max_retries
+        monkeypatch.setattr(retry, 'backoff_factor', 0)
+        monkeypatch.setattr(
+            urllib3.connectionpool.HTTPConnectionPool, '_make_request',
+            mock_make_request
+        )
+        try:
+            homework_module.get_api_answer(current_timestamp)
+        except requests.RequestException as e:
+            raise AssertionError(
+                f'Убедитесь, что в функции `{func_name}` обрабатывается '
+                'ситуация, когда истекло время ожидания ответа API.'
+            ) from e
+        except Exception as e:
+            assert 'время ожидания' in str(e), (
+                f'Убедитесь, что функция `{func_name}` сообщает о превышении '
+                'времени ожидания ответа API.'
+            )
+        else:
+            raise AssertionError(
+                f'Убедитесь, что функция `{func_name}` выбрасывает '
+                'исключение, когда истекло время ожидания ответа API.'
+            )
+        assert len(attempts) == retry.read + 1, (
+            'Убедитесь, что запрос повторяется при истечении времени '
+            'ожидания ответа API.'
+        )
+
+    def route_session_to(self, monkeypatch, homework_module, port):
+        """
+        Send API requests to a local port through the adapter that is
+        mounted for the real endpoint.
+        """
+        session = homework_module.get_session()
+        monkeypatch.setitem(
+            session.adapters, 'http://',
+            session.get_adapter(homework_module.ENDPOINT)
+        )
+        monkeypatch.setitem(
+            homework_module._PARAMS_REQUEST, 'url',
+            f'http://127.0.0.1:{port}/'
+        )
+
+    def test_get_api_answer_with_persistent_server_error(
+            self, current_timestamp, monkeypatch, homework_module
+    ):
+        func_name = 'get_api_answer'
+        utils.check_function(
+            homework_module,
+            func_name,
+            self.HOMEWORK_FUNC_WITH_PARAMS_QTY[func_name]
+        )
+
+        attempts = []
+
+        class BadGatewayHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                attempts.append(self.path)
+                body = b'{"message": "upstream is down"}'
+                self.send_response(HTTPStatus.BAD_GATEWAY)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), BadGatewayHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        retry = homework_module.get_session().get_adapter(
+            homework_module.ENDPOINT
+        ).max_retries
+        monkeypatch.setattr(retry, 'backoff_factor', 0)
+        self.route_session_to(
+            monkeypatch, homework_module, server.server_address[1]
+        )
+        try:
+            homework_module.get_api_answer(current_timestamp)
+        except Exception as e:
+            assert '502' in str(e) and 'upstream is down' in str(e), (
+                f'Убедитесь, что функция `{func_name}` сообщает код и текст '
+                'ответа API домашки, когда повторные запросы не помогли.'
+            )
+        else:
+            raise AssertionError(
+                f'Убедитесь, что в функции `{func_name}` обрабатывается '
+                'ситуация, когда API домашки возвращает код, отличный от 200.'
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert len(attempts) == retry.status + 1, (
+            'Убедитесь, что запрос повторяется, когда API домашки '
+            'возвращает ошибку сервера.'
+        )
+
+    def test_get_api_answer_with_body_read_timeout(self, current_timestamp,
+                                                   monkeypatch,
+                                                   homework_module):
+        func_name = 'get_api_answer'
+        utils.check_function(
+            homework_module,
+            func_name,
+            self.HOMEWORK_FUNC_WITH_PARAMS_QTY[func_name]
+        )
+
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        stop = threading.Event()
+
+        def send_headers_and_stall():
+            conn, _ = server.accept()
+            with conn:
+                conn.recv(65536)
+                conn.sendall(
+                    b'HTTP/1.1 200 OK\r\n'
+                    b'Content-Type: application/json\r\n'
+                    b'Content-Length: 100\r\n\r\n{"homeworks"'
+                )
+                stop.wait(2)
+
+        thread = threading.Thread(target=send_headers_and_stall, daemon=True)
+        thread.start()
+        self.route_session_to(
+            monkeypatch, homework_module, server.getsockname()[1]
+        )
+        monkeypatch.setattr(homework_module, 'REQUEST_TIMEOUT', (1, 0.2))
+        try:
+            homework_module.get_api_answer(current_timestamp)
+        except requests.RequestException as e:
+            raise AssertionError(
+                f'Убедитесь, что в функции `{func_name}` обрабатывается '
+                'ситуация, когда истекло время ожидания тела ответа API.'
+            ) from e
+        except Exception as e:
+            assert 'время ожидания' in str(e), (
+                f'Убедитесь, что функция `{func_name}` сообщает о превышении '
+                'времени ожидания тела ответа API.'
+            )
+        else:
+            raise AssertionError(
+                f'Убедитесь, что функция `{func_name}` выбрасывает '
+                'исключение, когда истекло время ожидания тела ответа API.'
+            )
+        finally:
+            stop.set()
+            thread.join()
+            server.close()
+
     def test_parse_status_with_expected_statuses(self, homework_module):
         func_name = 'parse_status'
         utils.check_function(
@@ -503,7 +722,7 @@ class TestHomework:
             inspect.getsource(homework_module.main)
         )
         bot_init_pattern = re.compile(
-            r'(\w* ?= ?)((telegram\.)?Bot\( *[\w=_\-\'\"]* *\))'
+            r'(\w* ?= ?)((telegram\.)?Bot\( *[\w=_\-\'\", ]* *\))'
         )
         search_result = re.search(bot_init_pattern, main_source)
         assert search_result, (
@@ -511,7 +730,7 @@ class TestHomework:
         )
 
         bot_init_with_token_pattern = re.compile(
-            r'Bot\( *token *= *TELEGRAM_TOKEN *\)'
+            r'Bot\( *token *= *TELEGRAM_TOKEN *[,)]'
         )
         assert re.search(bot_init_with_token_pattern, main_source), (
             'Убедитесь, что при создании бота в него передан токен: '
@@ -553,9 +772,9 @@ class TestHomework:
             if caller != 'main':
                 old_sleep(secs)
                 return
-            assert secs == 600, (
+            assert 590 < secs <= 600, (
                 'Убедитесь, что повторный запрос к API домашки отправляется '
-                'через 10 минут: `time.sleep(RETRY_PERIOD)`.'
+                'через 10 минут после начала предыдущего цикла.'
             )
             raise utils.BreakInfiniteLoop('break')
 
@@ -583,13 +802,71 @@ class TestHomework:
                 data=response_data
             ))
         monkeypatch.setattr(
-            requests,
+            homework_module.get_session(),
             'get',
             mock_response_get_with_new_status
         )
         if platform.system() != 'Windows':
             homework_module.main = utils.with_timeout(homework_module.main)
 
+    def run_main_polls(self, monkeypatch, random_message, random_timestamp,
+                       current_timestamp, homework_module, responses,
+                       fail_first_send_of=(), requested=None):
+        """
+        Run main() for one poll per item of `responses` and return the
+        messages it delivered. An exception item is raised by
+        get_api_answer. The first send of a message containing any of
+        `fail_first_send_of` fails. Timestamps passed to get_api_answer
+        are appended to `requested`.
+        """
+        self.mock_main(
+            monkeypatch,
+            random_message,
+            random_timestamp,
+            current_timestamp,
+            homework_module
+        )
+        polls = iter(responses)
+        sent = []
+        sleeps = []
+        failed = set()
+        requested = [] if requested is None else requested
+
+        def mock_get_api_answer(timestamp):
+            requested.append(timestamp)
+            response = next(polls)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        def mock_send_message(bot, message):
+            if message not in failed and any(
+                    text in message for text in fail_first_send_of):
+                failed.add(message)
+                return False
+            sent.append(message)
+            return True
+
+        def sleep_after_polls(secs):
+            caller = inspect.stack()[1].function
+            if caller != 'main':
+                old_sleep(secs)
+                return
+            sleeps.append(secs)
+            if len(sleeps) == len(responses):
+                raise utils.BreakInfiniteLoop('break')
+
+        monkeypatch.setattr(
+            homework_module, 'get_api_answer', mock_get_api_answer
+        )
+        monkeypatch.setattr(homework_module, 'send_message', mock_send_message)
+        monkeypatch.setattr(time, 'sleep', sleep_after_polls)
+        try:
+            homework_module.main()
+        except utils.BreakInfiniteLoop:
+            pass
+        return sent
+
     def test_main_without_env_vars_raise_exception(
             self, caplog, monkeypatch, random_timestamp, current_timestamp,
             random_message, homework_module
@@ -638,7 +915,7 @@ class TestHomework:
                     if record.message == utils.MockResponseGET.CALLED_LOG_MSG
                 ]
                 assert log_record, (
-                    'Убедитесь, что бот использует функцию `requests.get()` '
+                    'Убедитесь, что бот использует метод `get()` HTTP-сессии '
                     'для отправки запроса к API домашки.'
                 )
 
@@ -772,6 +1049,119 @@ class TestHomework:
                     'возникновении ошибки отправки сообщения в Телеграм.'
                 ) from e
 
+    def test_main_send_all_homeworks_oldest_first(self, monkeypatch,
+                                                  random_timestamp,
+                                                  current_timestamp,
+                                                  random_message,
+                                                  homework_module):
+        response = {
+            'homeworks': [
+                {'homework_name': 'hw2', 'status': 'reviewing'},
+                {'homework_name': 'hw1', 'status': 'approved'},
+            ],
+            'current_date': random_timestamp
+        }
+        sent = self.run_main_polls(
+            monkeypatch,
+            random_message,
+            random_timestamp,
+            current_timestamp,
+            homework_module,
+            [response]
+        )
+        assert len(sent) == 2, (
+            'Убедитесь, что бот отправляет сообщение для каждой домашней '
+            'работы из ответа API.'
+        )
+        assert '"hw1"' in sent[0] and '"hw2"' in sent[1], (
+            'Убедитесь, что сообщения о домашних работах отправляются '
+            'начиная с самой старой.'
+        )
+
+    def test_main_resend_only_undelivered_status(self, monkeypatch,
+                                                 random_timestamp,
+                                                 current_timestamp,
+                                                 random_message,
+                                                 homework_module):
+        response = {
+            'homeworks': [
+                {'homework_name': 'hw2', 'status': 'reviewing'},
+                {'homework_name': 'hw1', 'status': 'approved'},
+            ],
+            'current_date': random_timestamp
+        }
+        requested = []
+        sent = self.run_main_polls(
+            monkeypatch,
+            random_message,
+            random_timestamp,
+            current_timestamp,
+            homework_module,
+            [response, response],
+            fail_first_send_of=('"hw2"',),
+            requested=requested
+        )
+        assert requested[0] == requested[1], (
+            'Убедитесь, что при ошибке отправки сообщения бот повторяет '
+            'запрос к API домашки с прежней меткой времени.'
+        )
+        assert len(sent) == 2 and '"hw1"' in sent[0] and '"hw2"' in sent[1], (
+            'Убедитесь, что при повторном запросе бот отправляет только '
+            'недоставленные сообщения.'
+        )
+
+    def test_main_send_same_status_in_new_window(self, monkeypatch,
+                                                 random_timestamp,
+                                                 current_timestamp,
+                                                 random_message,
+                                                 homework_module):
+        def response(current_date):
+            return {
+                'homeworks': [
+                    {'homework_name': 'hw1', 'status': 'rejected'}
+                ],
+                'current_date': current_date
+            }
+
+        requested = []
+        sent = self.run_main_polls(
+            monkeypatch,
+            random_message,
+            random_timestamp,
+            current_timestamp,
+            homework_module,
+            [response(random_timestamp), response(random_timestamp + 600)],
+            requested=requested
+        )
+        assert requested[1] == random_timestamp, (
+            'Убедитесь, что следующий запрос к API домашки отправляется '
+            'с меткой времени `current_date` из предыдущего ответа.'
+        )
+        assert len(sent) == 2, (
+            'Убедитесь, что бот отправляет сообщение о каждом изменении '
+            'статуса, даже если текст сообщения совпадает с предыдущим.'
+        )
+
+    def test_main_send_repeated_error_once(self, monkeypatch,
+                                          random_timestamp,
+                                          current_timestamp,
+                                          random_message, homework_module):
+        error = ValueError('API недоступен')
+        valid_response = {'homeworks': [], 'current_date': random_timestamp}
+        sent = self.run_main_polls(
+            monkeypatch,
+            random_message,
+            random_timestamp,
+            current_timestamp,
+            homework_module,
+            [error, error, valid_response, error]
+        )
+        assert len(sent) == 2 and all(str(error) in m for m in sent), (
+            'Убедитесь, что повторяющаяся ошибка отправляется в Telegram '
+            'один раз и отправляется снова, если она повторилась после '
+            'успешного запроса к API.'
+        )
+
     def test_docstrings(self, homework_module):
         for func in self.HOMEWORK_FUNC_WITH_PARAMS_QTY:
             utils.check_docstring(homework_module, func)
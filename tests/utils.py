@@ -1,3 +1,4 @@
+import json
 import logging
 import signal
 import re
@@ -96,9 +97,19 @@ class MockResponseGET:
         self.data = default_data if data is None else data
         logging.warn(MockResponseGET.CALLED_LOG_MSG)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
     def json(self):
         return self.data
 
+    @property
+    def content(self):
+        return json.dumps(self.data).encode()
+
     def raise_for_status(self):
         if self.status_code >= 400:
             raise ValueError('Server or client error.')